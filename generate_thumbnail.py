@@ -14,38 +14,206 @@ Autor: Desarrollador Senior Python
 Fecha: Julio 2025
 """
 
+import copy
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
 import requests
-from urllib.parse import urlparse
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from requests.adapters import HTTPAdapter, Retry
+import yaml
+
+# Usar el loader C de libyaml cuando está disponible (~10x más rápido);
+# PyYAML cae en silencio al parser Python puro si no se compiló el binding
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
 from io import BytesIO
-import tempfile
+
+
+# Valores por defecto si config.yaml no existe o está incompleto
+CONFIG_DEFECTO = {
+    'canvas': {
+        'width': 1920,
+        'height': 1080,
+    },
+    'background': {
+        'blur_radius': 20,
+    },
+    'output': {
+        'format': 'png',
+        'png_quality': 95,
+        'create_psd': True,
+    },
+}
+
+# Ruta por defecto del config.yaml (junto a este script, no al cwd)
+RUTA_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.yaml')
+
+# Caché en memoria del config parseado, keyed por ruta -> (mtime, tamaño, dict)
+_cache_config = {}
+
+
+def cargar_configuracion(ruta=RUTA_CONFIG):
+    """
+    Carga config.yaml con caché en memoria para evitar re-parsear en cada uso.
+
+    La entrada de caché se invalida si cambian el mtime o el tamaño del
+    archivo, así que editar config.yaml sigue teniendo efecto inmediato.
+    Siempre devuelve una copia profunda para que el llamador pueda mutar
+    el dict sin corromper la caché ni los valores por defecto.
+
+    Args:
+        ruta (str): Ruta al archivo de configuración YAML
+
+    Returns:
+        dict: Configuración combinada (defaults + config.yaml)
+    """
+    try:
+        stat = os.stat(ruta)
+    except OSError:
+        # Sin config.yaml: usar valores por defecto
+        return copy.deepcopy(CONFIG_DEFECTO)
+
+    entrada = _cache_config.get(ruta)
+    if entrada is not None and entrada[0] == stat.st_mtime and entrada[1] == stat.st_size:
+        return copy.deepcopy(entrada[2])
+
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            config_usuario = yaml.load(f, Loader=_YamlLoader) or {}
+    except (OSError, yaml.YAMLError) as e:
+        print(f"⚠️  Error leyendo {ruta}: {e} - usando configuración por defecto")
+        return copy.deepcopy(CONFIG_DEFECTO)
+
+    # Un YAML válido puede no ser un dict (escalar suelto, lista...):
+    # tratarlo como configuración inválida, no dejar que reviente .items()
+    if not isinstance(config_usuario, dict):
+        print(f"⚠️  Formato inválido en {ruta} - usando configuración por defecto")
+        return copy.deepcopy(CONFIG_DEFECTO)
+
+    # Combinar con los valores por defecto sección a sección
+    config = copy.deepcopy(CONFIG_DEFECTO)
+    for seccion, valores in config_usuario.items():
+        if isinstance(valores, dict) and isinstance(config.get(seccion), dict):
+            config[seccion].update(valores)
+        elif isinstance(config.get(seccion), dict):
+            # p.ej. "canvas: null" no debe aniquilar la sección por defecto
+            print(f"⚠️  Sección '{seccion}' inválida en {ruta} - usando sus valores por defecto")
+        else:
+            config[seccion] = valores
+
+    _cache_config[ruta] = (stat.st_mtime, stat.st_size, config)
+    return copy.deepcopy(config)
+
+
+# Sesión HTTP compartida: reutiliza conexiones keep-alive entre descargas
+# (evita repetir handshakes TCP/TLS al bajar varios iconos del mismo CDN)
+# y reintenta una vez los fallos transitorios
+_sesion_http = requests.Session()
+_sesion_http.headers['User-Agent'] = 'thumbnail-blog-creator/1.0'
+_adaptador_http = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=1, backoff_factor=0.2),
+)
+_sesion_http.mount('https://', _adaptador_http)
+_sesion_http.mount('http://', _adaptador_http)
+
+
+# Caché en disco de descargas: los mismos iconos/fondos remotos se piden
+# una y otra vez entre ejecuciones; aquí se guardan los bytes por URL
+DIRECTORIO_CACHE_DESCARGAS = os.path.join(
+    os.path.expanduser('~'), '.cache', 'thumbnail_blog_creator', 'descargas')
+
+
+def _ruta_cache_descarga(url):
+    """
+    Calcula la ruta del archivo de caché para una URL.
+
+    Args:
+        url (str): URL de la imagen remota
+
+    Returns:
+        str: Ruta dentro del directorio de caché (sha1 de la URL)
+    """
+    import hashlib
+    clave = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(DIRECTORIO_CACHE_DESCARGAS, clave)
 
 
 def descargar_imagen(url_o_ruta):
     """
     Descarga una imagen desde URL o carga desde ruta local.
-    
+
+    Las descargas remotas se cachean en disco por URL, así que ejecuciones
+    posteriores con los mismos iconos no tocan la red.
+
     Args:
         url_o_ruta (str): URL o ruta local de la imagen
-        
+
     Returns:
         PIL.Image: Imagen cargada
     """
     if url_o_ruta.startswith(('http://', 'https://')):
+        # Comprobar caché en disco antes de ir a la red
+        ruta_cache = _ruta_cache_descarga(url_o_ruta)
+        if os.path.exists(ruta_cache):
+            try:
+                return Image.open(ruta_cache)
+            except Exception:
+                # Caché corrupta: descartar y volver a descargar
+                try:
+                    os.remove(ruta_cache)
+                except OSError:
+                    pass
+
+        limite_bytes = 20 * 1024 * 1024  # Límite duro de descarga: 20 MB
+
         try:
-            response = requests.get(url_o_ruta, timeout=30, stream=True)
+            response = _sesion_http.get(url_o_ruta, timeout=30, stream=True)
             response.raise_for_status()
-            
+
             # Obtener tamaño si está disponible
             tamaño = response.headers.get('content-length')
             if tamaño:
                 tamaño_mb = int(tamaño) / (1024 * 1024)
+                if int(tamaño) > limite_bytes:
+                    print(f"❌ Imagen demasiado grande ({tamaño_mb:.1f} MB, máximo 20 MB): {url_o_ruta}")
+                    response.close()
+                    sys.exit(1)
                 if tamaño_mb > 10:  # Advertir si es muy grande
                     print(f"⚠️  Imagen grande detectada: {tamaño_mb:.1f} MB")
-            
-            return Image.open(BytesIO(response.content))
+
+            # Descargar por bloques con tope, en vez de cargar la respuesta
+            # entera en memoria antes de poder comprobar su tamaño real
+            buffer = BytesIO()
+            total = 0
+            for bloque in response.iter_content(64 * 1024):
+                total += len(bloque)
+                if total > limite_bytes:
+                    print(f"❌ Imagen demasiado grande (>20 MB): {url_o_ruta}")
+                    response.close()
+                    sys.exit(1)
+                buffer.write(bloque)
+            response.close()
+
+            contenido = buffer.getvalue()
+
+            # Guardar en caché (escritura atómica para tolerar descargas paralelas)
+            try:
+                os.makedirs(DIRECTORIO_CACHE_DESCARGAS, exist_ok=True)
+                ruta_temporal = f"{ruta_cache}.{os.getpid()}.tmp"
+                with open(ruta_temporal, 'wb') as f:
+                    f.write(contenido)
+                os.replace(ruta_temporal, ruta_cache)
+            except OSError:
+                pass  # Sin caché no pasa nada, solo será más lento
+
+            return Image.open(BytesIO(contenido))
         except requests.exceptions.Timeout:
             print(f"❌ Timeout al descargar: {url_o_ruta}")
             sys.exit(1)
@@ -72,114 +240,319 @@ def descargar_imagen(url_o_ruta):
             sys.exit(1)
 
 
-def procesar_imagen_base(imagen_base, ancho=1920, alto=1080):
+# Caché en disco de fondos ya procesados (redimensionados + desenfocados):
+# en lotes y en la app web es común reutilizar la misma imagen de fondo
+DIRECTORIO_CACHE_FONDOS = os.path.join(
+    os.path.expanduser('~'), '.cache', 'thumbnail_blog_creator', 'fondos')
+
+
+def _fondo_procesado_cacheado(origen, ancho, alto, radio_desenfoque):
+    """
+    Devuelve el fondo procesado, reutilizando el resultado de ejecuciones
+    anteriores cuando el origen y los parámetros no han cambiado.
+
+    El redimensionado + desenfoque es el mayor coste de CPU del pipeline;
+    la clave de caché incluye mtime y tamaño para archivos locales (la URL
+    basta para remotos, que ya se cachean por contenido) más las
+    dimensiones del canvas y el radio.
+
+    Args:
+        origen (str): URL o ruta local de la imagen de fondo
+        ancho (int): Ancho del canvas
+        alto (int): Alto del canvas
+        radio_desenfoque (float): Radio del desenfoque del fondo
+
+    Returns:
+        PIL.Image: Fondo procesado (RGB, tamaño del canvas)
+    """
+    import hashlib
+
+    if origen.startswith(('http://', 'https://')):
+        clave_origen = origen
+    else:
+        try:
+            stat = os.stat(origen)
+            clave_origen = f"{os.path.abspath(origen)}|{stat.st_mtime}|{stat.st_size}"
+        except OSError:
+            # El error de archivo inexistente lo reporta descargar_imagen
+            clave_origen = None
+
+    ruta_cache = None
+    if clave_origen is not None:
+        clave = hashlib.sha1(
+            f"{clave_origen}|{ancho}x{alto}|{radio_desenfoque}".encode('utf-8')).hexdigest()
+        ruta_cache = os.path.join(DIRECTORIO_CACHE_FONDOS, f"{clave}.png")
+
+        if os.path.exists(ruta_cache):
+            try:
+                fondo = Image.open(ruta_cache)
+                fondo.load()
+                return fondo
+            except Exception:
+                try:
+                    os.remove(ruta_cache)
+                except OSError:
+                    pass
+
+    fondo = procesar_imagen_base(descargar_imagen(origen), ancho, alto, radio_desenfoque)
+
+    if ruta_cache is not None:
+        try:
+            os.makedirs(DIRECTORIO_CACHE_FONDOS, exist_ok=True)
+            ruta_temporal = f"{ruta_cache}.{os.getpid()}.tmp"
+            fondo.save(ruta_temporal, "PNG", optimize=False, compress_level=1)
+            os.replace(ruta_temporal, ruta_cache)
+        except OSError:
+            pass  # Sin caché no pasa nada, solo será más lento
+
+    return fondo
+
+
+def _calcular_cajas_para_gaussiano(sigma, n_cajas=3):
+    """
+    Calcula los tamaños de caja que aproximan un desenfoque gaussiano.
+
+    Usa la fórmula del W3C/Ivan Kutskir: tres pasadas de box blur con estos
+    anchos producen un resultado visualmente equivalente al gaussiano, pero
+    con coste constante por píxel independiente del radio.
+
+    Args:
+        sigma (float): Desviación estándar del gaussiano a aproximar
+        n_cajas (int): Número de pasadas de box blur
+
+    Returns:
+        list: Tamaños de caja (impares) para cada pasada
+    """
+    import math
+
+    ideal = math.sqrt((12 * sigma * sigma / n_cajas) + 1)
+    wl = int(math.floor(ideal))
+    if wl % 2 == 0:
+        wl -= 1
+    wu = wl + 2
+
+    m_ideal = (12 * sigma * sigma - n_cajas * wl * wl - 4 * n_cajas * wl - 3 * n_cajas) / (-4 * wl - 4)
+    m = int(round(m_ideal))
+
+    return [wl if i < m else wu for i in range(n_cajas)]
+
+
+def desenfoque_gaussiano_rapido(imagen, radio):
+    """
+    Aplica un desenfoque equivalente al gaussiano usando 3 pasadas de box blur.
+
+    GaussianBlur de PIL es O(radio) por píxel; con radios grandes (20+) sobre
+    un canvas de 1920x1080 es el mayor coste de CPU de cada thumbnail. Tres
+    pasadas de BoxBlur son O(1) por píxel respecto al radio y visualmente
+    equivalentes (~10x más rápido con radio 20).
+
+    Args:
+        imagen (PIL.Image): Imagen a desenfocar
+        radio (float): Radio equivalente del desenfoque gaussiano
+
+    Returns:
+        PIL.Image: Imagen desenfocada
+    """
+    if radio <= 0:
+        return imagen
+
+    resultado = imagen
+    for caja in _calcular_cajas_para_gaussiano(radio):
+        # BoxBlur de PIL recibe el radio de la caja (ancho = 2*radio + 1)
+        resultado = resultado.filter(ImageFilter.BoxBlur((caja - 1) // 2))
+
+    return resultado
+
+
+def _desenfocar_plano_reducido(plano, radio):
+    """
+    Desenfoca un plano 'L' a mitad de resolución y lo reescala.
+
+    Las sombras son señal de baja frecuencia: desenfocar a mitad de tamaño
+    con la mitad de radio toca 4x menos píxeles y el resultado reescalado es
+    indistinguible. Con radios pequeños no compensa y se desenfoca directo.
+
+    Args:
+        plano (PIL.Image): Plano 'L' a desenfocar
+        radio (float): Radio equivalente del desenfoque gaussiano
+
+    Returns:
+        PIL.Image: Plano desenfocado del tamaño original
+    """
+    if radio < 8:
+        return desenfoque_gaussiano_rapido(plano, radio)
+
+    ancho, alto = plano.size
+    reducido = plano.resize((max(1, ancho // 2), max(1, alto // 2)),
+                            Image.Resampling.BILINEAR)
+    reducido = desenfoque_gaussiano_rapido(reducido, radio / 2)
+    return reducido.resize((ancho, alto), Image.Resampling.BILINEAR)
+
+
+def _componer_sombra_negra(lienzo, plano_alfa, x=0, y=0):
+    """
+    Compone una sombra negra sobre el lienzo NumPy RGBA, in-place.
+
+    Para una sombra negra el operador "over" se reduce a atenuar el RGB del
+    fondo: out = fondo * (255 - alfa) / 255. Trabajar sobre un único buffer
+    NumPy evita crear una capa RGBA intermedia y recorrer el canvas entero
+    con alpha_composite por cada capa de sombra. El plano puede ser más
+    pequeño que el canvas; (x, y) lo posiciona y se recorta en los bordes.
+
+    Args:
+        lienzo (numpy.ndarray): Canvas RGBA uint8 (se modifica in-place)
+        plano_alfa (PIL.Image): Plano 'L' con la opacidad de la sombra
+        x (int): Posición horizontal del plano sobre el canvas
+        y (int): Posición vertical del plano sobre el canvas
+    """
+    alto_lienzo, ancho_lienzo = lienzo.shape[:2]
+    ancho_plano, alto_plano = plano_alfa.size
+
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + ancho_plano, ancho_lienzo), min(y + alto_plano, alto_lienzo)
+    if x0 >= x1 or y0 >= y1:
+        return
+
+    alfa = np.asarray(plano_alfa, dtype=np.uint16)[y0 - y:y1 - y, x0 - x:x1 - x, None]
+    region = lienzo[y0:y1, x0:x1]
+    region[..., :3] = ((region[..., :3].astype(np.uint16) * (255 - alfa) + 127) // 255
+                       ).astype(np.uint8)
+
+
+def procesar_imagen_base(imagen_base, ancho=1920, alto=1080, radio_desenfoque=20):
     """
     Redimensiona la imagen base y aplica desenfoque gaussiano.
-    
+
     Args:
         imagen_base (PIL.Image): Imagen base original
         ancho (int): Ancho objetivo en píxeles
         alto (int): Alto objetivo en píxeles
-        
+        radio_desenfoque (float): Radio del desenfoque del fondo
+
     Returns:
         PIL.Image: Imagen procesada
     """
+    # Para JPEGs aún sin decodificar, pedir a libjpeg que decodifique ya
+    # reducido (1/2, 1/4, 1/8): evita el IDCT a resolución nativa cuando la
+    # foto de origen es mucho más grande que el canvas. Se pide 2x el
+    # destino para que el LANCZOS final siga teniendo margen de calidad.
+    # En formatos que no lo soportan draft() no hace nada.
+    imagen_base.draft('RGB', (ancho * 2, alto * 2))
+
     # Convertir a RGB si es necesario
     if imagen_base.mode != 'RGB':
         imagen_base = imagen_base.convert('RGB')
-    
-    # Calcular dimensiones manteniendo aspecto
-    ratio_original = imagen_base.width / imagen_base.height
-    ratio_objetivo = ancho / alto
-    
-    if ratio_original > ratio_objetivo:
-        # La imagen es más ancha, ajustar por altura
-        nuevo_alto = alto
-        nuevo_ancho = int(alto * ratio_original)
-    else:
-        # La imagen es más alta, ajustar por ancho
-        nuevo_ancho = ancho
-        nuevo_alto = int(ancho / ratio_original)
-    
-    # Redimensionar
-    imagen_redimensionada = imagen_base.resize((nuevo_ancho, nuevo_alto), Image.Resampling.LANCZOS)
-    
-    # Crear canvas final y centrar imagen
-    canvas = Image.new('RGB', (ancho, alto), (0, 0, 0))
-    x_offset = (ancho - nuevo_ancho) // 2
-    y_offset = (alto - nuevo_alto) // 2
-    canvas.paste(imagen_redimensionada, (x_offset, y_offset))
-    
-    # Aplicar desenfoque gaussiano
-    imagen_desenfocada = canvas.filter(ImageFilter.GaussianBlur(radius=20))
-    
-    return imagen_desenfocada
 
+    # Redimensionar y recortar centrado en una sola operación: ImageOps.fit
+    # calcula primero el rectángulo de recorte y solo redimensiona esa
+    # región, sin el canvas intermedio sobredimensionado. BILINEAR en vez de
+    # LANCZOS: el detalle extra que preservaría LANCZOS lo destruye el
+    # desenfoque que viene justo después, y BILINEAR toca 2x2 píxeles por
+    # muestra frente a 6x6
+    # Desenfocar a mitad de resolución: el blur escala lineal con los
+    # píxeles, así que a 960x540 cuesta 4x menos, y tras reescalar el
+    # resultado es indistinguible de desenfocar a resolución completa
+    canvas = ImageOps.fit(imagen_base, (ancho // 2, alto // 2),
+                          method=Image.Resampling.BILINEAR, centering=(0.5, 0.5))
+
+    # Aplicar desenfoque gaussiano (aproximado con box blur, mucho más rápido)
+    imagen_desenfocada = desenfoque_gaussiano_rapido(canvas, radio_desenfoque / 2)
+
+    return imagen_desenfocada.resize((ancho, alto), Image.Resampling.BILINEAR)
+
+
+# Intentar cargar Alliance No.2 Bold Italic primero, luego alternativas EN CURSIVA
+# (constante de módulo: la lista de candidatas no cambia entre llamadas)
+FUENTES_POSIBLES = (
+    # Alliance No.2 Bold Italic (preferida)
+    "Alliance-No2-BoldItalic.ttf",
+    "AllianceNo2-BoldItalic.ttf",
+    "Alliance No.2 Bold Italic.ttf",
+    "/usr/share/fonts/truetype/alliance/Alliance-No2-BoldItalic.ttf",
+    "/System/Library/Fonts/Alliance No.2 Bold Italic.ttf",  # macOS
+    "C:/Windows/Fonts/Alliance-No2-BoldItalic.ttf",  # Windows
+
+    # Mejores alternativas Bold Italic disponibles en Linux
+    "/usr/share/fonts/truetype/liberation/LiberationSans-BoldItalic.ttf",  # Liberation Sans Bold Italic
+    "/usr/share/fonts/truetype/noto/NotoSerifDisplay-BoldItalic.ttf",      # Noto Serif Display Bold Italic
+    "/usr/share/fonts/opentype/urw-base35/NimbusMonoPS-BoldItalic.otf",    # Nimbus Mono PS Bold Italic
+    "/usr/share/fonts/truetype/liberation/LiberationMono-BoldItalic.ttf",  # Liberation Mono Bold Italic
+    "/usr/share/fonts/truetype/ubuntu/UbuntuSans-Italic[wdth,wght].ttf",   # Ubuntu Sans Bold Italic
+    "/usr/share/fonts/truetype/dejavu/DejaVuSerifCondensed-BoldItalic.ttf", # DejaVu Serif Bold Italic
 
+    # Fallbacks Windows/macOS
+    "times-bold-italic.ttf",
+    "Times-BoldItalic.ttf",
+    "/System/Library/Fonts/Times Bold Italic.ttf",  # macOS
+    "C:/Windows/Fonts/timesbi.ttf",  # Windows Times Bold Italic
+
+    # Más alternativas cursivas
+    "arial-italic.ttf",
+    "Arial-Italic.ttf",
+    "ariali.ttf",  # Arial Italic en Windows
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-BoldOblique.ttf",  # DejaVu Bold Oblique
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Italic.ttf",
+    "/usr/share/fonts/truetype/ubuntu/Ubuntu-BoldItalic.ttf",
+    "/System/Library/Fonts/Arial Italic.ttf",  # macOS
+    "C:/Windows/Fonts/ariali.ttf",  # Windows Arial Italic
+
+    # Si no hay cursivas específicas, usar regulares
+    "arial.ttf",
+    "Arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/TTF/arial.ttf",
+    "/System/Library/Fonts/Arial.ttf",  # macOS
+    "C:/Windows/Fonts/arial.ttf"  # Windows
+)
+
+
+@lru_cache(maxsize=1)
+def _ruta_fuente_preferida():
+    """
+    Resuelve una sola vez qué fuente de FUENTES_POSIBLES existe en el sistema.
+
+    La lista tiene ~30 candidatas y probarlas implica un intento de apertura
+    por cada una; el resultado es constante por máquina, así que se memoiza
+    y los distintos tamaños de fuente reutilizan la ruta ya resuelta.
+
+    Returns:
+        str: Ruta de la primera fuente cargable, o None si no hay ninguna
+    """
+    for fuente in FUENTES_POSIBLES:
+        try:
+            ImageFont.truetype(fuente, 12)
+            return fuente
+        except Exception:
+            continue
+    return None
+
+
+@lru_cache(maxsize=64)
 def obtener_fuente(tamano):
     """
     Obtiene la fuente Alliance No.2 Bold Italic o una alternativa en CURSIVA del sistema.
-    
+
+    El resultado se cachea por tamaño: el ajuste dinámico del título prueba
+    varios tamaños por thumbnail y cada carga TTF implica parsear la fuente
+    de nuevo, así que reutilizamos el mismo objeto de fuente.
+
     Args:
         tamano (int): Tamaño de la fuente
-        
+
     Returns:
         PIL.ImageFont: Objeto de fuente en cursiva
     """
-    # Intentar cargar Alliance No.2 Bold Italic primero, luego alternativas EN CURSIVA
-    fuentes_posibles = [
-        # Alliance No.2 Bold Italic (preferida)
-        "Alliance-No2-BoldItalic.ttf",
-        "AllianceNo2-BoldItalic.ttf",
-        "Alliance No.2 Bold Italic.ttf",
-        "/usr/share/fonts/truetype/alliance/Alliance-No2-BoldItalic.ttf",
-        "/System/Library/Fonts/Alliance No.2 Bold Italic.ttf",  # macOS
-        "C:/Windows/Fonts/Alliance-No2-BoldItalic.ttf",  # Windows
-        
-        # Mejores alternativas Bold Italic disponibles en Linux
-        "/usr/share/fonts/truetype/liberation/LiberationSans-BoldItalic.ttf",  # Liberation Sans Bold Italic
-        "/usr/share/fonts/truetype/noto/NotoSerifDisplay-BoldItalic.ttf",      # Noto Serif Display Bold Italic
-        "/usr/share/fonts/opentype/urw-base35/NimbusMonoPS-BoldItalic.otf",    # Nimbus Mono PS Bold Italic
-        "/usr/share/fonts/truetype/liberation/LiberationMono-BoldItalic.ttf",  # Liberation Mono Bold Italic
-        "/usr/share/fonts/truetype/ubuntu/UbuntuSans-Italic[wdth,wght].ttf",   # Ubuntu Sans Bold Italic
-        "/usr/share/fonts/truetype/dejavu/DejaVuSerifCondensed-BoldItalic.ttf", # DejaVu Serif Bold Italic
-        
-        # Fallbacks Windows/macOS
-        "times-bold-italic.ttf",
-        "Times-BoldItalic.ttf",
-        "/System/Library/Fonts/Times Bold Italic.ttf",  # macOS
-        "C:/Windows/Fonts/timesbi.ttf",  # Windows Times Bold Italic
-        
-        # Más alternativas cursivas
-        "arial-italic.ttf",
-        "Arial-Italic.ttf",
-        "ariali.ttf",  # Arial Italic en Windows
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-BoldOblique.ttf",  # DejaVu Bold Oblique
-        "/usr/share/fonts/truetype/liberation/LiberationSans-Italic.ttf",
-        "/usr/share/fonts/truetype/ubuntu/Ubuntu-BoldItalic.ttf",
-        "/System/Library/Fonts/Arial Italic.ttf",  # macOS
-        "C:/Windows/Fonts/ariali.ttf",  # Windows Arial Italic
-        
-        # Si no hay cursivas específicas, usar regulares
-        "arial.ttf",
-        "Arial.ttf", 
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-        "/usr/share/fonts/TTF/arial.ttf",
-        "/System/Library/Fonts/Arial.ttf",  # macOS
-        "C:/Windows/Fonts/arial.ttf"  # Windows
-    ]
-    
     fuente_encontrada = None
     fuente_usada = "Por defecto"
-    
-    for fuente in fuentes_posibles:
+
+    ruta_fuente = _ruta_fuente_preferida()
+    if ruta_fuente is not None:
         try:
-            fuente_encontrada = ImageFont.truetype(fuente, tamano)
-            fuente_usada = fuente
-            break
-        except:
-            continue
-    
+            fuente_encontrada = ImageFont.truetype(ruta_fuente, tamano)
+            fuente_usada = ruta_fuente
+        except Exception:
+            pass
+
     # Si no encuentra ninguna, usar fuente por defecto
     if fuente_encontrada is None:
         print("⚠️ Advertencia: No se pudo cargar ninguna fuente cursiva, usando fuente por defecto")
@@ -226,28 +599,33 @@ def dividir_texto_en_lineas(texto, fuente, ancho_max):
         list: Lista de líneas de texto
     """
     palabras = texto.split()
+    if not palabras:
+        return []
+
+    # Medir cada palabra una sola vez y acumular la suma, en lugar de medir
+    # la línea completa concatenada en cada iteración (cuadrático en texto)
+    anchos = [fuente.getlength(palabra) for palabra in palabras]
+    ancho_espacio = fuente.getlength(' ')
+
     lineas = []
-    linea_actual = ""
-    
-    for palabra in palabras:
-        linea_prueba = f"{linea_actual} {palabra}".strip()
-        bbox = fuente.getbbox(linea_prueba)
-        ancho_linea = bbox[2] - bbox[0]
-        
-        if ancho_linea <= ancho_max:
-            linea_actual = linea_prueba
+    linea_actual = []
+    ancho_actual = 0
+
+    for palabra, ancho_palabra in zip(palabras, anchos):
+        ancho_prueba = ancho_actual + (ancho_espacio if linea_actual else 0) + ancho_palabra
+
+        if ancho_prueba <= ancho_max or not linea_actual:
+            # Cabe en la línea (o es una palabra sola muy larga: la forzamos)
+            linea_actual.append(palabra)
+            ancho_actual = ancho_prueba
         else:
-            if linea_actual:
-                lineas.append(linea_actual)
-                linea_actual = palabra
-            else:
-                # Si una sola palabra es muy larga, la forzamos
-                lineas.append(palabra)
-                linea_actual = ""
-    
+            lineas.append(' '.join(linea_actual))
+            linea_actual = [palabra]
+            ancho_actual = ancho_palabra
+
     if linea_actual:
-        lineas.append(linea_actual)
-    
+        lineas.append(' '.join(linea_actual))
+
     return lineas
 
 
@@ -278,34 +656,62 @@ def añadir_titulo(imagen, titulo, ancho=1920, alto=1080):
     ancho_max_texto = int(ancho * 0.85)
     
     # === ALGORITMO DE AJUSTE DINÁMICO DE TAMAÑO ===
-    # Comenzar con el tamaño ideal de 158.52pt y reducir hasta máximo 2 líneas
+    # Buscar el mayor tamaño (entre el mínimo y el ideal de 158.52pt) con el
+    # que el título quepa en máximo 2 líneas. Como el número de líneas no
+    # crece al reducir la fuente, podemos hacer búsqueda binaria en lugar de
+    # bajar linealmente de a pasos fijos: O(log rango) medidas de texto.
     tamano_pt_inicial = 158.52
     tamano_pt_minimo = 60.0   # Reducir tamaño mínimo para ser más agresivo
-    paso_reduccion = 6.0      # Reducir de a 6pt cada vez para más precisión
-    
-    tamano_pt_actual = tamano_pt_inicial
-    lineas = []
-    fuente = None
-    
-    print(f"🔍 Ajustando tamaño de fuente para título: '{titulo[:50]}{'...' if len(titulo) > 50 else ''}'")
-    
-    while tamano_pt_actual >= tamano_pt_minimo:
+
+    def probar_tamano(tamano_pt):
+        """Devuelve (fuente, líneas) para un tamaño en puntos."""
         # Convertir puntos a píxeles (1 punto = 1/72 pulgadas, 1 pulgada = 96 píxeles)
-        tamano_fuente_px = int(tamano_pt_actual * 96 / 72)
-        fuente = obtener_fuente(tamano_fuente_px)
-        
-        # Dividir texto en líneas con el tamaño actual
-        lineas = dividir_texto_en_lineas(titulo, fuente, ancho_max_texto)
-        
-        print(f"   • {tamano_pt_actual:.1f}pt ({tamano_fuente_px}px) → {len(lineas)} línea(s)")
-        
-        # Si conseguimos máximo 2 líneas, usar este tamaño
-        if len(lineas) <= 2:
-            print(f"✅ Tamaño óptimo encontrado: {tamano_pt_actual:.1f}pt con {len(lineas)} línea(s)")
-            break
-        
-        # Reducir tamaño y probar de nuevo
-        tamano_pt_actual -= paso_reduccion
+        tamano_fuente_px = int(tamano_pt * 96 / 72)
+        fuente_probada = obtener_fuente(tamano_fuente_px)
+        return fuente_probada, dividir_texto_en_lineas(titulo, fuente_probada, ancho_max_texto)
+
+    print(f"🔍 Ajustando tamaño de fuente para título: '{titulo[:50]}{'...' if len(titulo) > 50 else ''}'")
+
+    tamano_pt_actual = tamano_pt_inicial
+    fuente, lineas = probar_tamano(tamano_pt_inicial)
+
+    if len(lineas) > 2:
+        fuente_min, lineas_min = probar_tamano(tamano_pt_minimo)
+
+        if len(lineas_min) > 2:
+            # Ni con el mínimo cabe: el bloque de emergencia de abajo divide
+            tamano_pt_actual = tamano_pt_minimo
+            fuente, lineas = fuente_min, lineas_min
+        else:
+            # Estimación analítica inicial: el ancho del texto escala ~lineal
+            # con el tamaño de fuente, así que una sola medida al tamaño
+            # inicial acota por arriba el rango de la búsqueda binaria
+            ancho_total_ref = fuente.getlength(titulo)
+            if ancho_total_ref > 0:
+                pt_estimado = tamano_pt_inicial * (2 * ancho_max_texto) / ancho_total_ref
+                tamano_pt_techo = min(tamano_pt_inicial, max(tamano_pt_minimo, pt_estimado * 1.2))
+            else:
+                tamano_pt_techo = tamano_pt_inicial
+
+            # Búsqueda binaria del mayor tamaño que produce <= 2 líneas
+            pt_bajo, pt_alto = tamano_pt_minimo, tamano_pt_techo
+            fuente, lineas = fuente_min, lineas_min
+            tamano_pt_actual = tamano_pt_minimo
+
+            while pt_alto - pt_bajo > 1.0:
+                pt_medio = (pt_bajo + pt_alto) / 2
+                fuente_medio, lineas_medio = probar_tamano(pt_medio)
+                print(f"   • {pt_medio:.1f}pt → {len(lineas_medio)} línea(s)")
+
+                if len(lineas_medio) <= 2:
+                    pt_bajo = pt_medio
+                    tamano_pt_actual = pt_medio
+                    fuente, lineas = fuente_medio, lineas_medio
+                else:
+                    pt_alto = pt_medio
+
+    if len(lineas) <= 2:
+        print(f"✅ Tamaño óptimo encontrado: {tamano_pt_actual:.1f}pt con {len(lineas)} línea(s)")
     
     # Si llegamos al mínimo y aún son más de 2 líneas, forzar a máximo 2 líneas
     if len(lineas) > 2:
@@ -361,151 +767,167 @@ def añadir_titulo(imagen, titulo, ancho=1920, alto=1080):
         y_inicial = int((alto - alto_total_texto) * 0.32)  # Dos líneas: más arriba para iconos
     
     # === CREAR MÚLTIPLES CAPAS DE SOMBRAS PROFESIONALES ===
-    
-    # === SOMBRA PARALELA MEJORADA ===
+    # Todas las sombras son negras, así que se componen sobre un único
+    # buffer NumPy en vez de una pasada alpha_composite por capa
+
+    lienzo = np.array(img_con_titulo, dtype=np.uint8)
+
+    # Posición X centrada de cada línea (se usa en todas las pasadas)
+    posiciones_lineas = []
     y_actual = y_inicial
     for linea in lineas:
         bbox_actual = fuente.getbbox(linea)
         ancho_linea = bbox_actual[2] - bbox_actual[0]
-        x = (ancho - ancho_linea) // 2
-        
-        # Especificaciones MEJORADAS: 85% opacidad (más opaca), 9px distancia, 40px blur
-        opacidad_paralela = int(255 * 0.85)  # ≈ 217 (más opaca que antes)
-        
-        # Crear múltiples capas de sombra para mayor profundidad
-        for desplazamiento in [12, 9, 6]:  # Múltiples sombras con diferentes desplazamientos
-            temp_sombra = Image.new('RGBA', (ancho, alto), (0, 0, 0, 0))
-            draw_sombra = ImageDraw.Draw(temp_sombra)
-            
-            # Opacidad decreciente para cada capa
-            opacidad_capa = int(opacidad_paralela * (desplazamiento / 12))
-            
-            # Dibujar sombra con desplazamiento
-            draw_sombra.text((x + desplazamiento, y_actual + desplazamiento), linea, 
-                           font=fuente, fill=(0, 0, 0, opacidad_capa))
-            
-            # Aplicar diferentes niveles de blur
-            blur_nivel = int(40 * (desplazamiento / 12))  # Blur más intenso para capas más lejanas
-            temp_sombra = temp_sombra.filter(ImageFilter.GaussianBlur(radius=blur_nivel))
-            
-            # Combinar con la imagen
-            img_con_titulo = Image.alpha_composite(img_con_titulo, temp_sombra)
-        
+        posiciones_lineas.append(((ancho - ancho_linea) // 2, y_actual))
         y_actual += alto_linea + espaciado_lineas
-    
+
+    # === SOMBRA PARALELA MEJORADA ===
+    # Especificaciones MEJORADAS: 85% opacidad (más opaca), 9px distancia, 40px blur
+    opacidad_paralela = int(255 * 0.85)  # ≈ 217 (más opaca que antes)
+
+    # Crear múltiples capas de sombra para mayor profundidad. Cada capa
+    # dibuja TODAS las líneas en un único plano 'L' y se desenfoca una vez:
+    # 3 blurs en total en vez de 3 por línea
+    for desplazamiento in [12, 9, 6]:  # Múltiples sombras con diferentes desplazamientos
+        # Opacidad decreciente para cada capa
+        opacidad_capa = int(opacidad_paralela * (desplazamiento / 12))
+        if opacidad_capa == 0:
+            continue  # Capa invisible: ahorrarse el blur y la composición
+
+        plano_alfa = Image.new('L', (ancho, alto), 0)
+        draw_sombra = ImageDraw.Draw(plano_alfa)
+        for linea, (x, y_linea) in zip(lineas, posiciones_lineas):
+            draw_sombra.text((x + desplazamiento, y_linea + desplazamiento), linea,
+                             font=fuente, fill=opacidad_capa)
+
+        # Aplicar diferentes niveles de blur (box blur rápido, ver chunk0-1)
+        blur_nivel = int(40 * (desplazamiento / 12))  # Blur más intenso para capas más lejanas
+        plano_alfa = _desenfocar_plano_reducido(plano_alfa, blur_nivel)
+
+        # Combinar con la imagen
+        _componer_sombra_negra(lienzo, plano_alfa)
+
     # === SOMBRA INTERIOR IMPLEMENTADA CORRECTAMENTE ===
-    y_actual = y_inicial
-    for linea in lineas:
-        bbox_actual = fuente.getbbox(linea)
-        ancho_linea = bbox_actual[2] - bbox_actual[0]
-        x = (ancho - ancho_linea) // 2
-        
-        # Especificaciones MEJORADAS: 45% opacidad (más opaca), 30° ángulo, 8% tamaño
-        opacidad_interior = int(255 * 0.45)  # ≈ 115 (más opaca que antes)
-        
-        # Calcular desplazamiento para ángulo de 30°
-        angulo_rad = math.radians(30)
-        tamano_sombra_interior = max(3, int(tamano_fuente_px * 0.08))  # 8% del tamaño de fuente
-        
-        # Desplazamiento basado en el ángulo (30° hacia arriba-derecha)
-        dx_interior = int(tamano_sombra_interior * math.cos(angulo_rad))
-        dy_interior = -int(tamano_sombra_interior * math.sin(angulo_rad))  # Negativo para ir hacia arriba
-        
-        # CREAR SOMBRA INTERIOR REALISTA
-        # La sombra interior se simula dibujando una versión más oscura del texto
-        # ligeramente desplazada DENTRO del contorno del texto principal
-        
-        # Crear máscara del texto principal
-        temp_mascara = Image.new('RGBA', (ancho, alto), (0, 0, 0, 0))
-        draw_mascara = ImageDraw.Draw(temp_mascara)
-        draw_mascara.text((x, y_actual), linea, font=fuente, fill=(255, 255, 255, 255))
-        
-        # Crear sombra interior
-        temp_sombra_interior = Image.new('RGBA', (ancho, alto), (0, 0, 0, 0))
+    # Especificaciones MEJORADAS: 45% opacidad (más opaca), 30° ángulo, 8% tamaño
+    opacidad_interior = int(255 * 0.45)  # ≈ 115 (más opaca que antes)
+
+    # Calcular desplazamiento para ángulo de 30°
+    angulo_rad = math.radians(30)
+    tamano_sombra_interior = max(3, int(tamano_fuente_px * 0.08))  # 8% del tamaño de fuente
+
+    # Desplazamiento basado en el ángulo (30° hacia arriba-derecha)
+    dx_interior = int(tamano_sombra_interior * math.cos(angulo_rad))
+    dy_interior = -int(tamano_sombra_interior * math.sin(angulo_rad))  # Negativo para ir hacia arriba
+
+    # CREAR SOMBRA INTERIOR REALISTA
+    # La sombra interior se simula dibujando una versión más oscura del texto
+    # ligeramente desplazada DENTRO del contorno del texto principal.
+    # Igual que arriba: todas las líneas comparten plano, blur y composición
+    if opacidad_interior > 0:
+        temp_sombra_interior = Image.new('L', (ancho, alto), 0)
         draw_interior = ImageDraw.Draw(temp_sombra_interior)
-        
-        # Dibujar múltiples capas de sombra interior para mayor realismo
-        for intensidad in [1.0, 0.7, 0.4]:
-            alpha_interior = int(opacidad_interior * intensidad)
-            desplaz_x = int(dx_interior * intensidad)
-            desplaz_y = int(dy_interior * intensidad)
-            
-            draw_interior.text((x + desplaz_x, y_actual + desplaz_y), linea, 
-                             font=fuente, fill=(0, 0, 0, alpha_interior))
-        
+
+        for linea, (x, y_linea) in zip(lineas, posiciones_lineas):
+            # Dibujar múltiples capas de sombra interior para mayor realismo
+            for intensidad in [1.0, 0.7, 0.4]:
+                alpha_interior = int(opacidad_interior * intensidad)
+                desplaz_x = int(dx_interior * intensidad)
+                desplaz_y = int(dy_interior * intensidad)
+
+                draw_interior.text((x + desplaz_x, y_linea + desplaz_y), linea,
+                                   font=fuente, fill=alpha_interior)
+
         # Aplicar ligero blur para suavizar la sombra interior
         temp_sombra_interior = temp_sombra_interior.filter(ImageFilter.GaussianBlur(radius=2))
-        
+
         # Combinar sombra interior
-        img_con_titulo = Image.alpha_composite(img_con_titulo, temp_sombra_interior)
-        
-        y_actual += alto_linea + espaciado_lineas
-    
+        _componer_sombra_negra(lienzo, temp_sombra_interior)
+
+    # Volver a PIL una sola vez con todas las sombras ya compuestas
+    img_con_titulo = Image.fromarray(lienzo, 'RGBA')
+
     # === TEXTO PRINCIPAL EN CURSIVA ===
     draw_final = ImageDraw.Draw(img_con_titulo)
-    y_actual = y_inicial
-    
-    for linea in lineas:
-        bbox_actual = fuente.getbbox(linea)
-        ancho_linea = bbox_actual[2] - bbox_actual[0]
-        x = (ancho - ancho_linea) // 2
-        
+
+    for linea, (x, y_linea) in zip(lineas, posiciones_lineas):
         # Blanco puro sin contorno, en cursiva (la fuente ya debe ser cursiva)
-        draw_final.text((x, y_actual), linea, font=fuente, fill=(255, 255, 255, 255))
-        
-        y_actual += alto_linea + espaciado_lineas
-    
+        draw_final.text((x, y_linea), linea, font=fuente, fill=(255, 255, 255, 255))
+
     return img_con_titulo.convert('RGB')
 
 
+@lru_cache(maxsize=32)
+def _procesar_icono(icono_path, ancho_max_por_icono):
+    """
+    Descarga y redimensiona un único icono (unidad de trabajo paralelizable).
+
+    El resultado se memoiza por (ruta, ancho máximo): en la app web el mismo
+    proceso genera muchos thumbnails con los mismos iconos y así se evita
+    repetir la carga y el LANCZOS. Los llamadores no mutan el icono devuelto.
+
+    Args:
+        icono_path (str): URL o ruta local del icono
+        ancho_max_por_icono (int): Ancho máximo por icono
+
+    Returns:
+        PIL.Image: Icono procesado en RGBA
+    """
+    # Descargar/cargar icono
+    icono = descargar_imagen(icono_path)
+
+    # Convertir a RGBA para preservar transparencia
+    if icono.mode not in ['RGBA', 'LA']:
+        if icono.mode == 'P' and 'transparency' in icono.info:
+            icono = icono.convert('RGBA')
+        else:
+            icono = icono.convert('RGBA')
+    elif icono.mode == 'LA':
+        icono = icono.convert('RGBA')
+
+    # Redimensionar manteniendo aspecto. thumbnail() aplica una
+    # pre-reducción entera barata (reduce) antes de la convolución LANCZOS,
+    # moviendo muchos menos bytes que resize() con orígenes grandes; además
+    # nunca agranda, igual que hacía el cálculo manual anterior
+    icono.thumbnail((ancho_max_por_icono, ancho_max_por_icono),
+                    Image.Resampling.LANCZOS, reducing_gap=2.0)
+    # Asegurar que el icono redimensionado está en RGBA
+    if icono.mode != 'RGBA':
+        icono = icono.convert('RGBA')
+    return icono
+
+
 def procesar_iconos(lista_iconos, ancho_max_por_icono):
     """
     Descarga y procesa los iconos redimensionándolos.
-    
+
+    Las descargas se hacen en paralelo con un pool de hilos: con N iconos
+    remotos la espera pasa de la suma de latencias a la del más lento.
+
     Args:
         lista_iconos (list): Lista de URLs/rutas de iconos
         ancho_max_por_icono (int): Ancho máximo por icono
-        
+
     Returns:
-        list: Lista de imágenes PIL procesadas
+        list: Lista de imágenes PIL procesadas (en el orden original)
     """
+    if not lista_iconos:
+        return []
+
     iconos_procesados = []
-    
-    for i, icono_path in enumerate(lista_iconos, 1):
-        try:
-            # Descargar/cargar icono
-            icono = descargar_imagen(icono_path)
-            
-            # Convertir a RGBA para preservar transparencia
-            if icono.mode not in ['RGBA', 'LA']:
-                if icono.mode == 'P' and 'transparency' in icono.info:
-                    icono = icono.convert('RGBA')
-                else:
-                    icono = icono.convert('RGBA')
-            elif icono.mode == 'LA':
-                icono = icono.convert('RGBA')
-            
-            # Redimensionar manteniendo aspecto
-            ratio = icono.width / icono.height
-            if icono.width > icono.height:
-                nuevo_ancho = min(ancho_max_por_icono, icono.width)
-                nuevo_alto = int(nuevo_ancho / ratio)
-            else:
-                nuevo_alto = min(ancho_max_por_icono, icono.height)
-                nuevo_ancho = int(nuevo_alto * ratio)
-            
-            icono_redimensionado = icono.resize((nuevo_ancho, nuevo_alto), Image.Resampling.LANCZOS)
-            # Asegurar que el icono redimensionado está en RGBA
-            if icono_redimensionado.mode != 'RGBA':
-                icono_redimensionado = icono_redimensionado.convert('RGBA')
-            iconos_procesados.append(icono_redimensionado)
-            
-        except Exception as e:
-            print(f"\n⚠️  Error procesando icono {i}: {icono_path}")
-            print(f"   Error: {e}")
-            print("   Continuando sin este icono...")
-            continue
-    
+
+    with ThreadPoolExecutor(max_workers=min(8, len(lista_iconos))) as executor:
+        futuros = [executor.submit(_procesar_icono, icono_path, ancho_max_por_icono)
+                   for icono_path in lista_iconos]
+
+        for i, (icono_path, futuro) in enumerate(zip(lista_iconos, futuros), 1):
+            try:
+                iconos_procesados.append(futuro.result())
+            except Exception as e:
+                print(f"\n⚠️  Error procesando icono {i}: {icono_path}")
+                print(f"   Error: {e}")
+                print("   Continuando sin este icono...")
+                continue
+
     return iconos_procesados
 
 
@@ -570,69 +992,95 @@ def añadir_iconos(imagen, iconos, ancho=1920, alto=1080):
     alto_max_icono = max(icono.height for icono in iconos_redimensionados)
     y_iconos = min(int(alto * 0.68), alto - alto_max_icono - 20)  # 20px de margen inferior
     
+    # Buffer NumPy único para sombras y pegado de iconos
+    lienzo = np.array(img_final, dtype=np.uint8)
+
     # === CREAR SOMBRAS PARALELAS MEJORADAS PARA TODOS LOS ICONOS ===
     x_actual = x_inicial
     for icono in iconos_redimensionados:
         # Centrar verticalmente cada icono en la línea base
         y_centrado = y_iconos + (alto_max_icono - icono.height) // 2
-        
+
         # Verificar que el icono esté completamente dentro del canvas
-        if x_actual + icono.width <= ancho and y_centrado + icono.height <= alto:
-            
+        # (también por la izquierda/arriba: con canvas muy bajos y_centrado
+        # puede salir negativo y un índice negativo no recorta, da la vuelta)
+        if (x_actual >= 0 and y_centrado >= 0 and
+                x_actual + icono.width <= ancho and y_centrado + icono.height <= alto):
+
             # === SOMBRA PARALELA PROFESIONAL MEJORADA ===
             # Especificaciones MEJORADAS: 85% opacidad (más opaca), 9px distancia, 40px blur
             opacidad_sombra = int(255 * 0.85)  # ≈ 217 (más opaca que antes)
             
+            # Canal alpha del icono (origen de la silueta de la sombra)
+            if icono.mode == 'RGBA':
+                alfa_icono = icono.getchannel('A')
+            else:
+                alfa_icono = Image.new('L', icono.size, 255)
+
+            # Iconos completamente transparentes no proyectan sombra
+            if opacidad_sombra == 0 or alfa_icono.getextrema()[1] == 0:
+                x_actual += icono.width + espaciado
+                continue
+
             # Crear múltiples capas de sombra para mayor profundidad
             for desplazamiento in [12, 9, 6]:  # Múltiples sombras con diferentes desplazamientos
-                temp_sombra_icono = Image.new('RGBA', (ancho, alto), (0, 0, 0, 0))
-                
-                # Crear máscara de sombra usando el alpha del icono original
-                for y in range(icono.height):
-                    for x in range(icono.width):
-                        pixel = icono.getpixel((x, y))
-                        # Manejar tanto RGB como RGBA
-                        if len(pixel) == 4:
-                            r, g, b, a = pixel
-                        else:
-                            r, g, b = pixel
-                            a = 255  # Asumir opacidad completa para RGB
-                        if a > 0:  # Solo donde hay contenido del icono
-                            # Posición con desplazamiento variable
-                            sombra_x = x_actual + x + desplazamiento
-                            sombra_y = y_centrado + y + desplazamiento
-                            
-                            # Verificar límites
-                            if 0 <= sombra_x < ancho and 0 <= sombra_y < alto:
-                                # Aplicar opacidad proporcional decreciente por capa
-                                alpha_capa = int(opacidad_sombra * (desplazamiento / 12) * (a / 255))
-                                temp_sombra_icono.putpixel((sombra_x, sombra_y), (0, 0, 0, alpha_capa))
-                
-                # Aplicar blur variable según la capa
-                blur_nivel = int(40 * (desplazamiento / 12))  # Blur más intenso para capas más lejanas
-                temp_sombra_icono = temp_sombra_icono.filter(ImageFilter.GaussianBlur(radius=blur_nivel))
-                
-                # Combinar con la imagen final
-                img_final = Image.alpha_composite(img_final, temp_sombra_icono)
+                # Escalar la opacidad de la silueta según la capa (antes se
+                # hacía píxel a píxel con getpixel/putpixel en Python puro)
+                factor = opacidad_sombra * (desplazamiento / 12) / 255
+                alfa_capa = alfa_icono.point(lambda a, f=factor: int(a * f))
+
+                # Blur más intenso para capas más lejanas
+                blur_nivel = int(40 * (desplazamiento / 12))
+
+                # Plano recortado al icono + margen para el blur, en vez del
+                # canvas completo: el coste del desenfoque escala con el área
+                # y el icono ocupa una fracción pequeña del canvas
+                margen = blur_nivel * 2 + desplazamiento
+                plano_alfa = Image.new(
+                    'L', (icono.width + 2 * margen, icono.height + 2 * margen), 0)
+                plano_alfa.paste(alfa_capa, (margen + desplazamiento, margen + desplazamiento))
+
+                plano_alfa = _desenfocar_plano_reducido(plano_alfa, blur_nivel)
+
+                # Combinar con la imagen final (recortando en los bordes)
+                _componer_sombra_negra(lienzo, plano_alfa,
+                                       x_actual - margen, y_centrado - margen)
         
         # Avanzar posición X
         x_actual += icono.width + espaciado
     
     # === PEGAR ICONOS PRINCIPALES ===
+    # Composición vectorizada: mezclar cada icono sobre su sub-rectángulo
+    # del mismo buffer NumPy que ya acumuló las sombras
     x_actual = x_inicial
     for icono in iconos_redimensionados:
         # Centrar verticalmente cada icono en la línea base
         y_centrado = y_iconos + (alto_max_icono - icono.height) // 2
-        
+
         # Verificar que el icono esté completamente dentro del canvas
-        if x_actual + icono.width <= ancho and y_centrado + icono.height <= alto:
-            # Pegar icono principal
-            img_final.paste(icono, (x_actual, y_centrado), icono)
-        
+        # (ver el guardia de las sombras: los índices negativos envuelven)
+        if (x_actual >= 0 and y_centrado >= 0 and
+                x_actual + icono.width <= ancho and y_centrado + icono.height <= alto):
+            icono_arr = np.asarray(icono, dtype=np.uint16)
+            region = lienzo[y_centrado:y_centrado + icono.height,
+                            x_actual:x_actual + icono.width]
+
+            # Iconos totalmente opacos (PNG sin transparencia): copia directa
+            # sin la multiplicación por píxel de la mezcla alpha
+            alfa_min, _ = icono.getchannel('A').getextrema()
+            if alfa_min == 255:
+                region[..., :3] = icono_arr[..., :3].astype(np.uint8)
+            else:
+                # Mezcla alpha "over" en aritmética entera: out = (icono*a + fondo*(255-a)) / 255
+                alfa = icono_arr[..., 3:4]
+                region[..., :3] = ((icono_arr[..., :3] * alfa +
+                                    region[..., :3].astype(np.uint16) * (255 - alfa) + 127) // 255
+                                   ).astype(np.uint8)
+
         # Avanzar posición X
         x_actual += icono.width + espaciado
-    
-    return img_final.convert('RGB')
+
+    return Image.fromarray(lienzo, 'RGBA').convert('RGB')
 
 
 def guardar_como_psd_simulado(imagen_fondo, imagen_con_titulo, iconos, titulo, ruta_salida):
@@ -657,9 +1105,8 @@ def guardar_como_psd_simulado(imagen_fondo, imagen_con_titulo, iconos, titulo, r
     # Guardar capa de fondo
     imagen_fondo.save(os.path.join(directorio_capas, "01_fondo_desenfocado.png"))
     
-    # Crear capa solo con texto (transparente)
-    capa_texto = Image.new('RGBA', imagen_fondo.size, (0, 0, 0, 0))
-    # Aquí se podría recrear solo el texto, por simplicidad guardamos referencia
+    # Guardar referencia del texto (recrear la capa completa no hace falta:
+    # era una asignación RGBA de canvas entero que nunca se usaba)
     with open(os.path.join(directorio_capas, "02_texto_info.txt"), 'w', encoding='utf-8') as f:
         f.write(f"Título: {titulo}\n")
         f.write("Posición: Centrado\n")
@@ -673,67 +1120,99 @@ def guardar_como_psd_simulado(imagen_fondo, imagen_con_titulo, iconos, titulo, r
     print(f"Capas PSD simuladas guardadas en: {directorio_capas}")
 
 
-def generar_thumbnail(imagen_base, titulo, iconos, ruta_salida="thumbnail"):
+def generar_thumbnail(imagen_base, titulo, iconos, ruta_salida="thumbnail", config=None):
     """
     Función principal que genera el thumbnail completo.
-    
+
     Args:
         imagen_base (str): Ruta o URL de la imagen base
         titulo (str): Título a mostrar
         iconos (list): Lista de rutas/URLs de iconos
         ruta_salida (str): Nombre base para archivos de salida
+        config (dict): Configuración ya cargada (None = cargar config.yaml)
+
+    Returns:
+        PIL.Image: Imagen final compuesta (además de guardarla en disco),
+                   para que llamadores en el mismo proceso la reutilicen
+                   sin re-decodificar el archivo
     """
     print("\n🚀 INICIANDO GENERACIÓN DE THUMBNAIL")
     print("═" * 60)
     
     pasos_totales = 5
-    
+
+    # Cargar configuración si el llamador no la pasa ya cargada
+    if config is None:
+        config = cargar_configuracion()
+    ancho = config['canvas']['width']
+    alto = config['canvas']['height']
+
     try:
-        # 1. Cargar y procesar imagen base
+        # 1. Cargar y procesar imagen base (con caché en disco del resultado)
         mostrar_progreso(1, pasos_totales, "Descargando y procesando imagen base...")
-        img_original = descargar_imagen(imagen_base)
-        img_fondo = procesar_imagen_base(img_original)
-        
+        img_fondo = _fondo_procesado_cacheado(imagen_base, ancho, alto,
+                                              config['background']['blur_radius'])
+
         # 2. Añadir título con sombras
         mostrar_progreso(2, pasos_totales, "Añadiendo título con efectos...")
-        img_con_titulo = añadir_titulo(img_fondo, titulo)
-        
+        img_con_titulo = añadir_titulo(img_fondo, titulo, ancho, alto)
+
         # 3. Procesar iconos
         mostrar_progreso(3, pasos_totales, "Procesando iconos...")
-        ancho_max_icono = int(1920 * 0.20)  # 20% del ancho para iconos más grandes
+        ancho_max_icono = int(ancho * 0.20)  # 20% del ancho para iconos más grandes
         iconos_procesados = procesar_iconos(iconos, ancho_max_icono)
-        
+
         # 4. Añadir iconos
         mostrar_progreso(4, pasos_totales, "Integrando iconos...")
-        img_final = añadir_iconos(img_con_titulo, iconos_procesados)
+        img_final = añadir_iconos(img_con_titulo, iconos_procesados, ancho, alto)
         
         # 5. Guardar resultados
         mostrar_progreso(5, pasos_totales, "Guardando archivos...")
         
         # Guardar PNG final
-        ruta_png = f"{ruta_salida}.png"
-        img_final.save(ruta_png, "PNG", optimize=False, compress_level=1)
+        formato = str(config['output'].get('format', 'png')).lower()
+        if formato == 'webp':
+            # WebP codifica más rápido que el zlib de PNG y pesa 30-50% menos
+            ruta_png = f"{ruta_salida}.webp"
+            img_final.save(ruta_png, "WEBP",
+                           quality=config['output']['png_quality'], method=4)
+        elif formato in ('jpg', 'jpeg'):
+            # JPEG: aquí sí aplica la calidad; sin submuestreo de croma para
+            # que el texto fino no pierda nitidez
+            ruta_png = f"{ruta_salida}.jpg"
+            img_final.save(ruta_png, "JPEG",
+                           quality=config['output']['png_quality'],
+                           subsampling=0, optimize=True, progressive=True)
+        else:
+            # compress_level=1: el nivel 6 por defecto de zlib tarda varias
+            # veces más por ~20% menos de tamaño, mal negocio para thumbnails
+            ruta_png = f"{ruta_salida}.png"
+            img_final.save(ruta_png, "PNG", optimize=False, compress_level=1)
         
-        # Guardar PSD simulado
-        ruta_psd = f"{ruta_salida}.psd"
-        guardar_como_psd_simulado(img_fondo, img_con_titulo, iconos_procesados, titulo, ruta_psd)
+        # Guardar PSD simulado (desactivable desde config.yaml)
+        if config['output']['create_psd']:
+            ruta_psd = f"{ruta_salida}.psd"
+            guardar_como_psd_simulado(img_fondo, img_con_titulo, iconos_procesados, titulo, ruta_psd)
         
         print()
         print("✅ GENERACIÓN COMPLETADA CON ÉXITO")
         print("╔" + "═" * 58 + "╗")
         print("║" + "📁 ARCHIVOS GENERADOS:".ljust(58) + "║")
         print("║" + f"   🖼️  {ruta_png}".ljust(58) + "║")
-        print("║" + f"   📂 {ruta_salida}_capas/ (capas separadas)".ljust(58) + "║")
+        if config['output']['create_psd']:
+            print("║" + f"   📂 {ruta_salida}_capas/ (capas separadas)".ljust(58) + "║")
         print("║" + " " * 58 + "║")
         print("║" + f"📊 ESTADÍSTICAS:".ljust(58) + "║")
-        print("║" + f"   • Resolución: 1920x1080 píxeles".ljust(58) + "║")
+        print("║" + f"   • Resolución: {ancho}x{alto} píxeles".ljust(58) + "║")
         print("║" + f"   • Líneas de texto: {len(dividir_texto_en_lineas(titulo, obtener_fuente(130), 1536))}".ljust(58) + "║")
         print("║" + f"   • Iconos: {len(iconos)}".ljust(58) + "║")
         print("║" + f"   • Tamaño archivo: ~{os.path.getsize(ruta_png) // 1024} KB".ljust(58) + "║")
         print("╚" + "═" * 58 + "╝")
         print()
         print("🎉 ¡Tu thumbnail está listo para usar!")
-        
+
+        return img_final
+
     except Exception as e:
         print(f"\n❌ ERROR DURANTE LA GENERACIÓN:")
         print(f"   {str(e)}")
@@ -744,6 +1223,46 @@ def generar_thumbnail(imagen_base, titulo, iconos, ruta_salida="thumbnail"):
         raise
 
 
+def _generar_thumbnail_trabajo(trabajo):
+    """
+    Desempaqueta un trabajo de lote y genera su thumbnail.
+
+    Args:
+        trabajo (dict): Argumentos para generar_thumbnail
+
+    Returns:
+        str: Ruta base de salida del thumbnail generado
+    """
+    generar_thumbnail(**trabajo)
+    return trabajo.get('ruta_salida', 'thumbnail')
+
+
+def generar_thumbnails_en_lote(trabajos, max_procesos=None):
+    """
+    Genera varios thumbnails en paralelo usando un pool de procesos.
+
+    La generación es trabajo de CPU (blur, sombras, composición), así que
+    hilos no escalan por el GIL; con procesos el rendimiento crece casi
+    lineal con los núcleos. Las cachés en disco (descargas) se comparten
+    entre procesos vía el sistema de archivos.
+
+    Args:
+        trabajos (list): Lista de dicts con los argumentos de generar_thumbnail
+                         (imagen_base, titulo, iconos, ruta_salida)
+        max_procesos (int): Número máximo de procesos (None = nº de núcleos)
+
+    Returns:
+        list: Rutas base de salida, en el mismo orden que los trabajos
+    """
+    if not trabajos:
+        return []
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=max_procesos) as executor:
+        return list(executor.map(_generar_thumbnail_trabajo, trabajos))
+
+
 def mostrar_banner():
     """Muestra un banner de bienvenida atractivo."""
     print("\n" + "╔" + "═" * 58 + "╗")
@@ -0,0 +1,23 @@
+# Configuración de Gunicorn para el generador de thumbnails
+#
+# Uso: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# - preload_app: importa Flask/PIL/numpy una sola vez en el master y los
+#   workers heredan la memoria por fork (arranque más rápido, menos RAM)
+# - gthread: PIL y numpy sueltan el GIL en sus kernels C, así que varios
+#   hilos por worker sirven generaciones concurrentes sin bloquearse
+# - workers: pocos, porque cada worker reparte la generación a su propio
+#   pool de procesos (ver web_app._get_executor, dimensionado a
+#   cpu_count/workers); así workers x pool queda acotado por los núcleos
+# - max_requests: recicla workers periódicamente para acotar la memoria
+
+bind = '0.0.0.0:5000'
+workers = 2
+# Publicar el número de workers para que web_app dimensione su pool
+raw_env = [f'GUNICORN_WORKERS={workers}']
+worker_class = 'gthread'
+threads = 4
+preload_app = True
+timeout = 120  # la generación puede tardar varios segundos con iconos remotos
+max_requests = 200
+max_requests_jitter = 50
@@ -11,14 +11,13 @@ Autor: Desarrollador Senior Python
 Fecha: Agosto 2025
 """
 
+import logging
+import multiprocessing
 import os
-import base64
-import tempfile
 import uuid
-from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
 from flask import Flask, render_template, request, jsonify, send_file
-from werkzeug.utils import secure_filename
-from generate_thumbnail import generar_thumbnail
+from generate_thumbnail import generar_thumbnail, cargar_configuracion
 import webbrowser
 import threading
 import time
@@ -39,34 +38,109 @@ os.makedirs(RESULTS_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['RESULTS_FOLDER'] = RESULTS_FOLDER
 
-print(f"📁 Carpeta de uploads: {UPLOAD_FOLDER}")
-print(f"📁 Carpeta de resultados: {RESULTS_FOLDER}")
+# Diagnóstico por request detrás de un logger: con nivel INFO en
+# producción los debug no formatean cadenas ni compiten por stdout
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+log.info("📁 Carpeta de uploads: %s", UPLOAD_FOLDER)
+log.info("📁 Carpeta de resultados: %s", RESULTS_FOLDER)
+
+# Extensiones permitidas (frozenset: membership O(1) e inmutable)
+ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'svg'})
+
+# Pool de procesos para la generación: el trabajo es CPU puro (blur,
+# sombras, composición) y ejecutarlo en el propio proceso Flask bloquearía
+# a los demás hilos del worker en el GIL. Se crea perezosamente para no
+# arrancar procesos al importar (p.ej. bajo gunicorn preload)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Devuelve el ProcessPoolExecutor compartido, creándolo si hace falta."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn en vez de fork: los workers de gunicorn (gthread) tienen
+            # varios hilos y hacer fork con locks internos tomados puede
+            # dejar colgado al proceso hijo.
+            # Dimensionado: cada worker de gunicorn (2 en gunicorn.conf.py)
+            # tiene su propio pool, así que se divide entre workers para que
+            # el total de procesos hijos no supere los núcleos de la máquina
+            workers_web = int(os.environ.get('GUNICORN_WORKERS', '1'))
+            _executor = ProcessPoolExecutor(
+                max_workers=max(1, (os.cpu_count() or 2) // workers_web),
+                mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def _generar_en_proceso(argumentos):
+    """Worker picklable: ejecuta generar_thumbnail en un proceso hijo."""
+    # La interfaz web sirve siempre PNG: /generate, /preview y /download
+    # apuntan a thumbnail_<id>.png, así que se fija el formato de salida
+    # aunque config.yaml pida webp/jpg para el uso por CLI
+    config = cargar_configuracion()
+    config['output']['format'] = 'png'
+    generar_thumbnail(config=config, **argumentos)
 
-# Extensiones permitidas
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'svg'}
 
 def allowed_file(filename):
     """Verifica si el archivo tiene una extensión permitida."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+
+def _guardar_subida(file):
+    """
+    Guarda un archivo subido deduplicado por contenido.
+
+    El nombre es el hash blake2b de los bytes: re-subir la misma imagen
+    (típico al iterar sobre el título) reutiliza el archivo existente, y al
+    no reescribirlo el mtime se conserva, con lo que la caché de fondos
+    procesados del generador también acierta.
+
+    Args:
+        file: FileStorage de Werkzeug ya validado con allowed_file
+
+    Returns:
+        str: Nombre del archivo dentro de UPLOAD_FOLDER
+    """
+    import hashlib
+
+    datos = file.read()
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    clave = hashlib.blake2b(datos, digest_size=16).hexdigest()
+    unique_filename = f"{clave}.{extension}"
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+
+    if not os.path.exists(file_path):
+        with open(file_path, 'wb') as f:
+            f.write(datos)
+
+    return unique_filename
+
 def cleanup_old_files():
     """Limpia archivos temporales antiguos (más de 24 horas) - NO se ejecuta en cada carga."""
     try:
         current_time = time.time()
         for folder in [UPLOAD_FOLDER, RESULTS_FOLDER]:
-            if os.path.exists(folder):
-                for filename in os.listdir(folder):
-                    file_path = os.path.join(folder, filename)
-                    if os.path.isfile(file_path):
-                        file_age = current_time - os.path.getctime(file_path)
-                        if file_age > 86400:  # 24 horas - más conservador
-                            try:
-                                os.remove(file_path)
-                                print(f"🗑️  Archivo antiguo eliminado: {filename}")
-                            except OSError as e:
-                                print(f"⚠️  No se pudo eliminar {filename}: {e}")
+            if not os.path.exists(folder):
+                continue
+            # os.scandir cachea el stat en cada DirEntry: un syscall por
+            # archivo en vez de los tres de listdir+isfile+getctime
+            with os.scandir(folder) as entradas:
+                for entry in entradas:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    file_age = current_time - entry.stat().st_ctime
+                    if file_age > 86400:  # 24 horas - más conservador
+                        try:
+                            os.remove(entry.path)
+                            log.info("🗑️  Archivo antiguo eliminado: %s", entry.name)
+                        except OSError as e:
+                            log.warning("⚠️  No se pudo eliminar %s: %s", entry.name, e)
     except Exception as e:
-        print(f"Error limpiando archivos temporales: {e}")
+        log.warning("Error limpiando archivos temporales: %s", e)
 
 @app.route('/')
 def index():
@@ -84,12 +158,9 @@ def upload_file():
         if 'background_image' in request.files:
             file = request.files['background_image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4().hex}_{filename}"
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(file_path)
+                unique_filename = _guardar_subida(file)
                 response['files']['background'] = unique_filename
-                print(f"✅ Imagen de fondo guardada: {unique_filename}")
+                log.debug("✅ Imagen de fondo guardada: %s", unique_filename)
         
         # Procesar iconos
         icons = []
@@ -97,12 +168,9 @@ def upload_file():
             if key.startswith('icon_'):
                 file = request.files[key]
                 if file and file.filename and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    unique_filename = f"{uuid.uuid4().hex}_{filename}"
-                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                    file.save(file_path)
+                    unique_filename = _guardar_subida(file)
                     icons.append(unique_filename)
-                    print(f"✅ Icono guardado: {unique_filename}")
+                    log.debug("✅ Icono guardado: %s", unique_filename)
         
         # Siempre incluir icons en la respuesta (vacío si no hay)
         response['files']['icons'] = icons
@@ -110,7 +178,8 @@ def upload_file():
         response['success'] = True
         response['message'] = f"Archivos subidos correctamente. Fondo: {'✅' if 'background' in response['files'] else '❌'}, Iconos: {len(icons)}"
         
-        print(f"📤 Respuesta /upload: success={response['success']}, background={'✅' if 'background' in response['files'] else '❌'}, icons={len(icons)}")
+        log.debug("📤 Respuesta /upload: success=%s, background=%s, icons=%d",
+                  response['success'], 'background' in response['files'], len(icons))
         
         return jsonify(response)
         
@@ -132,37 +201,35 @@ def generate_thumbnail():
         
         # Preparar rutas de archivos
         background_file = data.get('background_file')
-        print(f"📥 background_file recibido: {background_file}")
+        log.debug("📥 background_file recibido: %s", background_file)
         background_path = os.path.join(app.config['UPLOAD_FOLDER'], background_file)
-        print(f"   📂 Ruta construida: {background_path}")
-        print(f"   ✓ Existe: {os.path.exists(background_path)}")
+        log.debug("   📂 Ruta construida: %s", background_path)
         
         if not os.path.exists(background_path):
-            print(f"   ❌ ARCHIVO NO ENCONTRADO!")
-            print(f"   📂 Contenido de {app.config['UPLOAD_FOLDER']}:")
+            log.warning("❌ Imagen de fondo no encontrada: %s", background_path)
             try:
                 for f in os.listdir(app.config['UPLOAD_FOLDER']):
-                    print(f"      - {f}")
+                    log.debug("   - %s", f)
             except Exception as e:
-                print(f"      Error listando: {e}")
+                log.debug("   Error listando: %s", e)
             return jsonify({'success': False, 'message': 'Imagen de fondo no encontrada'})
         
         # Preparar iconos
         icon_paths = []
         icon_files = data.get('icon_files', [])
-        print(f"📥 icon_files recibido: {icon_files} (type: {type(icon_files)})")
+        log.debug("📥 icon_files recibido: %s", icon_files)
         
         if icon_files and isinstance(icon_files, list) and len(icon_files) > 0:
             for icon_file in icon_files:
                 icon_path = os.path.join(app.config['UPLOAD_FOLDER'], icon_file)
-                print(f"   🔍 Verificando icono: {icon_path}")
+                log.debug("   🔍 Verificando icono: %s", icon_path)
                 if os.path.exists(icon_path):
                     icon_paths.append(icon_path)
-                    print(f"   ✅ Icono encontrado: {icon_file}")
+                    log.debug("   ✅ Icono encontrado: %s", icon_file)
                 else:
-                    print(f"   ❌ Icono NO encontrado: {icon_file}")
+                    log.warning("   ❌ Icono NO encontrado: %s", icon_file)
         
-        print(f"📤 Iconos a procesar: {len(icon_paths)}")
+        log.debug("📤 Iconos a procesar: %d", len(icon_paths))
         
         # Generar nombre único para el resultado
         result_id = uuid.uuid4().hex
@@ -170,39 +237,52 @@ def generate_thumbnail():
         result_path = os.path.join(app.config['RESULTS_FOLDER'], result_name)
         
         # Generar thumbnail usando la función existente
-        print(f"🎨 Generando thumbnail:")
-        print(f"   📸 Fondo: {background_path}")
-        print(f"   📝 Título: {data['title']}")
-        print(f"   🎯 Iconos: {len(icon_paths)}")
+        log.info("🎨 Generando thumbnail: titulo=%r, iconos=%d", data['title'], len(icon_paths))
         
-        generar_thumbnail(
-            imagen_base=background_path,
-            titulo=data['title'],
-            iconos=icon_paths,
-            ruta_salida=result_path
-        )
+        # Ejecutar la generación en un proceso hijo: libera el GIL del worker
+        # web y reparte generaciones concurrentes entre núcleos
+        _get_executor().submit(_generar_en_proceso, {
+            'imagen_base': background_path,
+            'titulo': data['title'],
+            'iconos': icon_paths,
+            'ruta_salida': result_path,
+        }).result()
         
         # Verificar que se generó correctamente
         png_path = f"{result_path}.png"
         if os.path.exists(png_path):
-            # Convertir imagen a base64 para preview
-            with open(png_path, 'rb') as img_file:
-                img_base64 = base64.b64encode(img_file.read()).decode('utf-8')
-            
+            # El preview se sirve como URL en vez de incrustar base64 en el
+            # JSON: base64 infla los bytes un 33% y bloquea el navegador
+            # hasta recibir la respuesta completa
             return jsonify({
                 'success': True,
                 'message': '🎉 Thumbnail generado exitosamente',
                 'result_id': result_id,
-                'preview': f"data:image/png;base64,{img_base64}",
+                'preview': f"/preview/{result_id}",
                 'download_url': f"/download/{result_id}"
             })
         else:
             return jsonify({'success': False, 'message': 'Error al generar el thumbnail'})
             
     except Exception as e:
-        print(f"❌ Error generando thumbnail: {e}")
+        log.exception("❌ Error generando thumbnail: %s", e)
         return jsonify({'success': False, 'message': f'Error interno: {str(e)}'})
 
+@app.route('/preview/<result_id>')
+def preview_thumbnail(result_id):
+    """Sirve el preview del thumbnail generado (descarga condicional con ETag)."""
+    try:
+        png_path = os.path.join(app.config['RESULTS_FOLDER'], f"thumbnail_{result_id}.png")
+        if os.path.exists(png_path):
+            response = send_file(png_path, mimetype='image/png', conditional=True)
+            response.headers['Cache-Control'] = 'private, max-age=60'
+            return response
+        else:
+            return "Archivo no encontrado", 404
+    except Exception as e:
+        return f"Error: {str(e)}", 500
+
+
 @app.route('/download/<result_id>')
 def download_thumbnail(result_id):
     """Descarga el thumbnail generado."""